@@ -0,0 +1,104 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "referrer", "spm", "_ga", "_gl", "cmpid", "smid",
+}
+TRACKING_PREFIXES = ("utm_", "pf_rd_", "pd_rd_")
+# Parameters that are only tracking on some sites and mean something elsewhere,
+# e.g. ?tag= on Stack Overflow or ?ref= on GitHub
+SITE_TRACKING_PARAMS = {
+    "amazon": {"tag", "ref", "ref_"},
+    "youtube.com": {"si"},
+    "youtu.be": {"si"},
+    "open.spotify.com": {"si"},
+}
+# Fragments used by client-side routers address distinct pages and are kept
+ROUTED_FRAGMENT_PREFIXES = ("/", "!")
+
+# Host prefixes that serve the same content as the bare domain
+HOST_PREFIXES = ("www.", "m.", "mobile.", "amp.")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Amazon marketplaces; anything else named amazon.* is just another site
+AMAZON_MARKETPLACES = (
+    "amazon.com", "amazon.ca", "amazon.com.mx", "amazon.com.br", "amazon.co.uk", "amazon.de",
+    "amazon.fr", "amazon.it", "amazon.es", "amazon.nl", "amazon.se", "amazon.pl", "amazon.com.be",
+    "amazon.ie", "amazon.com.tr", "amazon.ae", "amazon.sa", "amazon.eg", "amazon.in", "amazon.co.jp",
+    "amazon.cn", "amazon.sg", "amazon.com.au",
+)
+AMAZON_HOST_RE = re.compile(r"(?:^|\.)(" + "|".join(re.escape(m) for m in AMAZON_MARKETPLACES) + r")$")
+ASIN_PATH_RES = [
+    re.compile(r"/dp/([A-Z0-9]{10})(?:[/?]|$)", re.IGNORECASE),
+    re.compile(r"/gp/product/([A-Z0-9]{10})(?:[/?]|$)", re.IGNORECASE),
+    re.compile(r"/gp/aw/d/([A-Z0-9]{10})(?:[/?]|$)", re.IGNORECASE),
+    re.compile(r"/exec/obidos/(?:tg/detail/-/|asin/)?([A-Z0-9]{10})(?:[/?]|$)", re.IGNORECASE),
+    re.compile(r"/o/(?:asin/)?([A-Z0-9]{10})(?:[/?]|$)", re.IGNORECASE),
+]
+
+
+def canonicalize_url(link):
+    """Return a canonical form of a link so variants of the same page compare equal."""
+    parts = urlsplit(link.strip())
+    host = normalize_host(parts.hostname or "")
+    if not host:
+        return link.strip()
+
+    amazon_host = AMAZON_HOST_RE.search(host)
+    if amazon_host:
+        asin = extract_asin(parts.path)
+        if asin:
+            return f"https://www.{amazon_host.group(1)}/dp/{asin}"
+
+    site_params = _site_tracking_params(host, amazon_host)
+    query = urlencode(sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(key, site_params)
+    ))
+    path = parts.path.rstrip("/")
+    fragment = parts.fragment if parts.fragment.startswith(ROUTED_FRAGMENT_PREFIXES) else ""
+    return urlunsplit(("https", _netloc(host, parts), path, query, fragment))
+
+
+def extract_asin(path):
+    """Extract the ten character Amazon product ID from a URL path, if any."""
+    for pattern in ASIN_PATH_RES:
+        match = pattern.search(path)
+        if match:
+            return match.group(1).upper()
+    return None
+
+
+def normalize_host(host):
+    host = host.lower().rstrip(".")
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix) and host.count(".") > 1:
+            return host[len(prefix):]
+    return host
+
+
+def _netloc(host, parts):
+    """The host, plus the port when it isn't the default for the link's scheme."""
+    if ":" in host:
+        host = f"[{host}]"  # IPv6 literal
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        return f"{host}:{port}"
+    return host
+
+
+def _site_tracking_params(host, amazon_host):
+    if amazon_host:
+        return SITE_TRACKING_PARAMS["amazon"]
+    return SITE_TRACKING_PARAMS.get(host, set())
+
+
+def _is_tracking_param(key, site_params=()):
+    key = key.lower()
+    return key in TRACKING_PARAMS or key in site_params or key.startswith(TRACKING_PREFIXES)
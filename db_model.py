@@ -7,10 +7,14 @@ link_tags = db.Table(
 
 class UserLink(db.Model):
     __tablename__ = 'user_links'
+    __table_args__ = (
+        db.UniqueConstraint('chat_id', 'canonical_url', name='uq_user_links_chat_canonical_url'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     chat_id = db.Column(db.String, nullable=False)  # Telegram chat ID
     link = db.Column(db.String, nullable=False)
+    canonical_url = db.Column(db.String, nullable=True, index=True)  # See canonical_url.py
     title = db.Column(db.String, nullable=True)
     description = db.Column(db.Text, nullable=True)
     url = db.Column(db.String, nullable=True)
@@ -18,6 +22,7 @@ class UserLink(db.Model):
     images = db.Column(db.JSON, nullable=True)  # Store as JSON
     site_name = db.Column(db.String, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
+    price_checked_at = db.Column(db.DateTime, nullable=True)  # Last price refresh
 
     # Many-to-many relationship with tags
     tags = db.relationship('Tag', secondary=link_tags, back_populates='links')
@@ -37,3 +42,68 @@ class Tag(db.Model):
 
     def __repr__(self):
         return f"<Tag {self.name}>"
+
+
+class ChatTagUsage(db.Model):
+    """How often and how recently a chat has attached each tag."""
+    __tablename__ = 'chat_tag_usage'
+    __table_args__ = (
+        db.Index('ix_chat_tag_usage_rank', 'chat_id', 'use_count', 'last_used_at'),
+    )
+
+    chat_id = db.Column(db.String, primary_key=True)
+    tag_id = db.Column(db.Integer, db.ForeignKey('tags.id'), primary_key=True)
+    use_count = db.Column(db.Integer, nullable=False, default=0)
+    last_used_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
+
+    tag = db.relationship('Tag')
+
+    def __repr__(self):
+        return f"<ChatTagUsage {self.chat_id}:{self.tag_id} x{self.use_count}>"
+
+
+class PriceHistory(db.Model):
+    """A product's price, recorded only when it changes. Shared by every chat that saved it."""
+    __tablename__ = 'price_history'
+    __table_args__ = (
+        db.Index('ix_price_history_product', 'canonical_url', 'recorded_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    canonical_url = db.Column(db.String, nullable=False)
+    price = db.Column(db.String, nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
+
+    def __repr__(self):
+        return f"<PriceHistory {self.canonical_url} {self.price}>"
+
+
+class HistoryPageView(db.Model):
+    """When a chat last opened its history page, used to prioritise price refreshes."""
+    __tablename__ = 'history_page_views'
+
+    chat_id = db.Column(db.String, primary_key=True)
+    viewed_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
+
+    def __repr__(self):
+        return f"<HistoryPageView {self.chat_id} {self.viewed_at}>"
+
+
+class DomainFetchStats(db.Model):
+    """Learned direct-fetch vs. unblocker statistics for a domain. See fetch_router.py."""
+    __tablename__ = 'domain_fetch_stats'
+
+    domain = db.Column(db.String, primary_key=True)
+    direct_successes = db.Column(db.Integer, nullable=False, default=0)
+    direct_failures = db.Column(db.Integer, nullable=False, default=0)
+    direct_failure_streak = db.Column(db.Integer, nullable=False, default=0)
+    direct_latency_ms = db.Column(db.Float, nullable=True)
+    unblocker_successes = db.Column(db.Integer, nullable=False, default=0)
+    unblocker_failures = db.Column(db.Integer, nullable=False, default=0)
+    unblocker_latency_ms = db.Column(db.Float, nullable=True)
+    needs_unblocker = db.Column(db.Boolean, nullable=False, default=False)
+    last_probe_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        route = "unblocker" if self.needs_unblocker else "direct"
+        return f"<DomainFetchStats {self.domain} {route}>"
@@ -0,0 +1,143 @@
+import time
+import threading
+from contextlib import contextmanager
+
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, orm
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds, in seconds, of the pool checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.01, 0.1, 1.0, float("inf"))
+
+
+class PoolWaitMetrics:
+    """How long requests waited to check a connection out of each pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}
+
+    def observe(self, pool_name, seconds, timed_out=False):
+        with self._lock:
+            stats = self._pools.setdefault(pool_name, {
+                "checkouts": 0,
+                "timeouts": 0,
+                "total_wait_ms": 0.0,
+                "max_wait_ms": 0.0,
+                "buckets": [0] * len(WAIT_BUCKETS),
+            })
+            if timed_out:
+                stats["timeouts"] += 1
+            else:
+                stats["checkouts"] += 1
+            wait_ms = seconds * 1000
+            stats["total_wait_ms"] += wait_ms
+            stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+            for i, upper in enumerate(WAIT_BUCKETS):
+                if seconds <= upper:
+                    stats["buckets"][i] += 1
+                    break
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for pool_name, stats in self._pools.items():
+                attempts = stats["checkouts"] + stats["timeouts"]
+                result[pool_name] = {
+                    "checkouts": stats["checkouts"],
+                    "timeouts": stats["timeouts"],
+                    "avg_wait_ms": round(stats["total_wait_ms"] / attempts, 3) if attempts else 0.0,
+                    "max_wait_ms": round(stats["max_wait_ms"], 3),
+                    "wait_histogram_ms": {
+                        _bucket_label(upper): count for upper, count in zip(WAIT_BUCKETS, stats["buckets"])
+                    },
+                }
+            return result
+
+
+def timed_pool_class(pool_name, metrics):
+    """Return a QueuePool subclass that reports checkout wait time to `metrics`.
+
+    A class rather than a pool instance so that the engine's pool `recreate()`
+    keeps reporting under the same name.
+    """
+    class TimedQueuePool(QueuePool):
+        def _do_get(self):
+            started_at = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except Exception:
+                metrics.observe(pool_name, time.perf_counter() - started_at, timed_out=True)
+                raise
+            metrics.observe(pool_name, time.perf_counter() - started_at)
+            return connection
+
+    TimedQueuePool.__name__ = f"TimedQueuePool[{pool_name}]"
+    return TimedQueuePool
+
+
+def engine_options(url, pool_name, metrics, pool_size=5, max_overflow=10, pool_timeout=30,
+                   pool_recycle=1800, pool_pre_ping=True, statement_timeout_ms=None):
+    """Build create_engine keyword arguments for a pooled engine.
+
+    SQLite is left on SQLAlchemy's defaults since it does not use QueuePool.
+    """
+    if url.startswith("sqlite"):
+        return {}
+
+    options = {
+        "poolclass": timed_pool_class(pool_name, metrics),
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": pool_timeout,
+        "pool_recycle": pool_recycle,
+        "pool_pre_ping": pool_pre_ping,
+    }
+    if statement_timeout_ms and url.startswith("postgres"):
+        options["connect_args"] = {"options": f"-c statement_timeout={int(statement_timeout_ms)}"}
+    return options
+
+
+class RoutingSession(SignallingSession):
+    """Session that sends queries to the read engine inside `db.reading()`.
+
+    Flushes always go to the primary, so writes made while reading still land
+    in the right place.
+    """
+
+    def __init__(self, db, autocommit=False, autoflush=True, **options):
+        self._routing_db = db
+        SignallingSession.__init__(self, db, autocommit=autocommit, autoflush=autoflush, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        read_engine = self._routing_db.read_engine
+        if read_engine is not None and self.info.get("use_read_engine") and not self._flushing:
+            return read_engine
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """SQLAlchemy extension with an optional second engine for read-only queries."""
+
+    read_engine = None
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def configure_read_engine(self, url, **options):
+        self.read_engine = create_engine(url, **options)
+
+    @contextmanager
+    def reading(self):
+        """Route the current session's queries to the read engine for the block."""
+        session = self.session()
+        previous = session.info.get("use_read_engine", False)
+        session.info["use_read_engine"] = True
+        try:
+            yield
+        finally:
+            session.info["use_read_engine"] = previous
+
+
+def _bucket_label(upper):
+    return f"<={upper * 1000:g}" if upper != float("inf") else f">{WAIT_BUCKETS[-2] * 1000:g}"
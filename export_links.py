@@ -0,0 +1,57 @@
+import io
+import csv
+import json
+
+EXPORT_FIELDS = [
+    "id", "link", "canonical_url", "title", "description", "url",
+    "price", "site_name", "images", "tags", "created_at",
+]
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def iter_ndjson(rows, chunk_size=500):
+    """Yield newline-delimited JSON in chunks of up to `chunk_size` rows."""
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(row, default=str, ensure_ascii=False))
+        if len(chunk) >= chunk_size:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+def iter_csv(rows, chunk_size=500):
+    """Yield CSV with a header line first, then chunks of up to `chunk_size` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield _drain(buffer)
+
+    pending = 0
+    for row in rows:
+        writer.writerow([_csv_value(row.get(field)) for field in EXPORT_FIELDS])
+        pending += 1
+        if pending >= chunk_size:
+            yield _drain(buffer)
+            pending = 0
+    if pending:
+        yield _drain(buffer)
+
+
+def _csv_value(value):
+    # Lists (images, tags) are pipe-delimited, like the data-tags attribute in the history page
+    if isinstance(value, list):
+        return "|".join(str(item) for item in value)
+    return "" if value is None else value
+
+
+def _drain(buffer):
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return value
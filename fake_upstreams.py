@@ -0,0 +1,176 @@
+"""Local stand-ins for the SOAX and Telegram APIs, used by load_replay.py.
+
+Each service gets its own latency, jitter and error rate so a load test can
+model a slow scraper or a flaky Bot API. Also serves plain pages with
+OpenGraph tags under /page/<n> for the direct-fetch path.
+
+    python fake_upstreams.py --port 8081 --soax-latency-ms 800 --telegram-error-rate 0.01
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+SERVICES = ("soax", "telegram", "page")
+
+
+class UpstreamBehaviour:
+    """Latency and error injection for one fake service."""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    def delay(self, rng):
+        latency = self.latency_ms + (rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+    def should_fail(self, rng):
+        return self.error_rate > 0 and rng.random() < self.error_rate
+
+
+class FakeUpstreams:
+    def __init__(self, host="127.0.0.1", port=0, behaviours=None, seed=None):
+        self.behaviours = {service: UpstreamBehaviour() for service in SERVICES}
+        self.behaviours.update(behaviours or {})
+        self.requests = Counter()
+        self.errors = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-upstreams", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def _apply(self, service):
+        """Sleep for the service's latency; return True if this request should fail."""
+        with self._lock:
+            rng = random.Random(self._rng.random())
+        behaviour = self.behaviours[service]
+        behaviour.delay(rng)
+        failed = behaviour.should_fail(rng)
+        with self._lock:
+            self.requests[service] += 1
+            if failed:
+                self.errors[service] += 1
+        return failed
+
+
+def _make_handler(upstreams):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            query = parse_qs(parts.query)
+            if parts.path == "/v1/request":
+                self._soax_product(query.get("param", [""])[0])
+            elif parts.path == "/v1/unblocker/html":
+                self._page("soax", query.get("url", [""])[0])
+            elif parts.path.startswith("/page/"):
+                self._page("page", parts.path)
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.startswith("/bot"):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                if upstreams._apply("telegram"):
+                    self._send(502, {"ok": False, "description": "Bad Gateway"})
+                else:
+                    self._send(200, {"ok": True, "result": True})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def _soax_product(self, link):
+            if upstreams._apply("soax"):
+                self._send(500, {"error": "upstream error"})
+                return
+            product_id = abs(hash(link)) % 100000
+            self._send(200, {"data": {"status": "done", "value": {
+                "title": f"Product {product_id}",
+                "price": f"{(product_id % 500) + 0.99:.2f}",
+                "url": link,
+                "extras": {"imagesSmall": [f"https://example.com/images/{product_id}.jpg"]},
+            }}})
+
+        def _page(self, service, url):
+            if upstreams._apply(service):
+                self._send(503, "<html><body>Service unavailable</body></html>", "text/html")
+                return
+            html = (
+                "<html><head>"
+                f'<meta property="og:title" content="Page {url}">'
+                '<meta property="og:description" content="A synthetic page for load testing">'
+                '<meta property="og:site_name" content="Fake site">'
+                "</head><body></body></html>"
+            )
+            self._send(200, html, "text/html")
+
+        def _send(self, status, body, content_type="application/json"):
+            data = (json.dumps(body) if content_type == "application/json" else body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def add_arguments(parser):
+    """Add per-service --<service>-latency-ms/-jitter-ms/-error-rate options."""
+    for service in SERVICES:
+        parser.add_argument(f"--{service}-latency-ms", type=float, default=0)
+        parser.add_argument(f"--{service}-jitter-ms", type=float, default=0)
+        parser.add_argument(f"--{service}-error-rate", type=float, default=0.0)
+
+
+def behaviours_from_args(args):
+    return {
+        service: UpstreamBehaviour(
+            latency_ms=getattr(args, f"{service}_latency_ms"),
+            jitter_ms=getattr(args, f"{service}_jitter_ms"),
+            error_rate=getattr(args, f"{service}_error_rate"),
+        )
+        for service in SERVICES
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--seed", type=int, default=None)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    upstreams = FakeUpstreams(args.host, args.port, behaviours_from_args(args), seed=args.seed)
+    print(f"Fake SOAX/Telegram listening on {upstreams.base_url}")
+    upstreams.serve_forever()
@@ -0,0 +1,124 @@
+import time
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from canonical_url import normalize_host
+
+# Weight of the newest sample in the latency moving averages
+LATENCY_EWMA_ALPHA = 0.3
+
+
+class DomainStats:
+    """What we have learned about fetching pages from one domain."""
+
+    FIELDS = (
+        "direct_successes", "direct_failures", "direct_failure_streak", "direct_latency_ms",
+        "unblocker_successes", "unblocker_failures", "unblocker_latency_ms",
+        "needs_unblocker", "last_probe_at",
+    )
+
+    def __init__(self, **values):
+        self.direct_successes = 0
+        self.direct_failures = 0
+        self.direct_failure_streak = 0
+        self.direct_latency_ms = None
+        self.unblocker_successes = 0
+        self.unblocker_failures = 0
+        self.unblocker_latency_ms = None
+        self.needs_unblocker = False
+        self.last_probe_at = None
+        for field, value in values.items():
+            if field in self.FIELDS and value is not None:
+                setattr(self, field, value)
+
+    def should_try_direct(self, now, probe_interval):
+        if not self.needs_unblocker:
+            return True
+        # Re-probe domains that needed the unblocker in case they stopped blocking
+        return self.last_probe_at is None or now - self.last_probe_at >= probe_interval
+
+
+class FetchRouter:
+    """Fetch pages directly when a domain allows it, through the unblocker otherwise.
+
+    `direct_fetch(url)` and `unblocker_fetch(url)` return page HTML or raise.
+    A direct result only counts when `is_usable(html)` accepts it, so block
+    pages that come back with a 200 still route the domain to the unblocker.
+
+    Stats are shared by every worker through the database. They are read
+    with `load_stats(domain)` (a dict or None). Each outcome is applied
+    where they are stored, by `record_direct(domain, ok, latency_ms, now,
+    failure_threshold)` or `record_unblocker(domain, ok, latency_ms)`. Both
+    must update counters in place, so concurrent workers don't overwrite
+    each other, and return the updated stats as a dict. Updating DomainStats
+    in memory and saving whole rows back would let one worker's stale copy
+    undo another's `needs_unblocker`.
+    """
+
+    def __init__(self, direct_fetch, unblocker_fetch, is_usable, load_stats, record_direct, record_unblocker,
+                 probe_interval=timedelta(hours=6), failure_threshold=2, cache_ttl=300):
+        self._direct_fetch = direct_fetch
+        self._unblocker_fetch = unblocker_fetch
+        self._is_usable = is_usable
+        self._load_stats = load_stats
+        self._record_direct = record_direct
+        self._record_unblocker = record_unblocker
+        self.probe_interval = probe_interval
+        self.failure_threshold = failure_threshold
+        self.cache_ttl = cache_ttl
+        self._cache = {}  # domain -> (loaded_at, DomainStats)
+        self._lock = threading.Lock()
+
+    def fetch(self, url):
+        domain = normalize_host(urlsplit(url).hostname or "")
+        stats = self.stats_for(domain)
+        now = datetime.now()
+
+        if stats.should_try_direct(now, self.probe_interval):
+            started_at = time.perf_counter()
+            try:
+                html = self._direct_fetch(url)
+                ok = self._is_usable(html)
+            except Exception as e:
+                print(f"Direct fetch failed for {domain}: {e}")
+                ok = False
+            latency_ms = (time.perf_counter() - started_at) * 1000
+            self._record(domain, self._record_direct, ok, latency_ms, now, self.failure_threshold)
+            if ok:
+                return html
+
+        started_at = time.perf_counter()
+        try:
+            html = self._unblocker_fetch(url)
+        except Exception:
+            self._record(domain, self._record_unblocker, False, None)
+            raise
+        self._record(domain, self._record_unblocker, True, (time.perf_counter() - started_at) * 1000)
+        return html
+
+    def stats_for(self, domain):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(domain)
+            if entry and now - entry[0] < self.cache_ttl:
+                return entry[1]
+
+        try:
+            stats = DomainStats(**(self._load_stats(domain) or {}))
+        except Exception as e:
+            print(f"Could not load fetch stats for {domain}: {e}")
+            stats = DomainStats()
+        with self._lock:
+            self._cache[domain] = (now, stats)
+        return stats
+
+    def _record(self, domain, record, *outcome):
+        try:
+            stats = DomainStats(**record(domain, *outcome))
+        except Exception as e:
+            print(f"Could not save fetch stats for {domain}: {e}")
+            return
+        # The stored row includes other workers' updates, so it replaces the cached copy
+        with self._lock:
+            self._cache[domain] = (time.monotonic(), stats)
@@ -1,11 +1,26 @@
-import os
+import json
 from datetime import datetime
+from html import escape
+from price_refresh import parse_price
+from history_storage import ShardedFileStorage
 
-def generate_html(chat_id, user_links, link_metadata, first_name):
+BASE_URL = "https://flask-production-4c83.up.railway.app"
+HISTORY_DIR = "/app/storage/links_history"
+
+
+def history_url(chat_id):
+    """Return the public URL of a chat's history page."""
+    return f"{BASE_URL}/storage/links_history/{history_filename(chat_id)}"
+
+
+def history_filename(chat_id):
+    return f"{chat_id}_history.html"
+
+
+def generate_html(chat_id, user_links, link_metadata, first_name, storage=None):
     """Generate a mobile-friendly HTML file with link history and metadata."""
-    directory = "/app/storage/links_history"
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+    if storage is None:
+        storage = ShardedFileStorage(HISTORY_DIR)
 
     # Extract all unique tags
     all_tags = sorted(set(tag for metadata in link_metadata for tag in metadata.get("tags", [])))
@@ -51,10 +66,14 @@ def generate_html(chat_id, user_links, link_metadata, first_name):
                 background-color: #00796b;
                 color: #ffffff;
             }
+            #bookmark-viewport {
+                position: relative;
+            }
             .bookmarks {
                 display: grid;
                 grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
                 gap: 16px;
+                will-change: transform;
             }
             .bookmark {
                 background-color: #fff;
@@ -64,6 +83,9 @@ def generate_html(chat_id, user_links, link_metadata, first_name):
                 box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1);
                 transition: transform 0.2s;
                 position: relative;
+                box-sizing: border-box;
+                height: 200px;  /* Fixed so the virtualized list can compute row offsets */
+                overflow: hidden;
             }
             .bookmark:hover {
                 transform: translateY(-5px);
@@ -104,15 +126,38 @@ def generate_html(chat_id, user_links, link_metadata, first_name):
                 color: #555;
                 margin: 8px 0 0;
             }
+            .bookmark .description {
+                display: -webkit-box;
+                -webkit-line-clamp: 2;
+                -webkit-box-orient: vertical;
+                overflow: hidden;
+            }
+            .bookmark .created-at {
+                text-align: right;
+                font-size: 0.8rem;
+                color: #888;
+            }
             .price {
                 font-weight: bold;
                 color: #27ae60;
                 margin-top: 8px;
             }
+            .price-change {
+                font-weight: normal;
+                font-size: 0.8rem;
+                color: #888;
+            }
+            .price-change.down {
+                color: #27ae60;
+            }
+            .price-change.up {
+                color: #c0392b;
+            }
             .tags {
                 margin-top: 8px;
                 display: flex;
-                flex-wrap: wrap;
+                flex-wrap: nowrap;
+                overflow: hidden;
                 gap: 8px;
             }
             .tag {
@@ -160,37 +205,28 @@ def generate_html(chat_id, user_links, link_metadata, first_name):
 
     def generate_tag_filters():
         filters_html = '<div class="filters">'
-        filters_html += '<span class="filter active" onclick="filterByTag(\'all\')">All</span>'
+        filters_html += '<span class="filter active" data-all="1">All</span>'
         for tag in all_tags:
-            filters_html += f'<span class="filter" onclick="filterByTag(\'{tag}\')">{tag}</span>'
+            filters_html += f'<span class="filter" data-tag="{escape(tag)}">{escape(tag)}</span>'
         filters_html += '</div>'
         return filters_html
 
-    def generate_bookmark_cards():
-        cards_html = ""
+    def price_direction(price, previous_price):
+        current, previous = parse_price(price), parse_price(previous_price)
+        if current is None or previous is None or current == previous:
+            return ""
+        return "down" if current < previous else "up"
+
+    def generate_bookmark_data():
+        """Card data plus a tag -> card index, rendered client-side by the virtualized list."""
+        cards = []
+        tag_index = {}
         current_time = datetime.now()
-    
+
         for link, metadata in zip(user_links, link_metadata):
-            # Handle images
-            images = metadata.get("images", [])
-            image_html = f'<img src="{images[0]}" alt="Image">' if images else ""
-    
-            # Format price if available
-            price = metadata.get("price", None)
-            price_html = f'<p class="price">Price: ${price}</p>' if price and price != "N/A" else ""
-    
-            # Handle tags
-            tags = metadata.get("tags", [])
-            tags_html = (
-                '<div class="tags">' +
-                f'<span class="add-tag" onclick="openTagDialog({link.id})">+</span>' +
-                "".join([f'<span class="tag">{tag}</span>' for tag in tags]) +
-                "</div>"
-            )
-    
             # Format creation time
             created_at = metadata.get("created_at")
-            created_at_html = ""
+            formatted_time = ""
             if created_at:
                 days_difference = (current_time - created_at).days
                 if days_difference == 0:
@@ -199,54 +235,185 @@ def generate_html(chat_id, user_links, link_metadata, first_name):
                     formatted_time = created_at.strftime("%d/%m/%y")
                 else:
                     formatted_time = f"{days_difference} days ago"
-                created_at_html = f'<p style="text-align: right; font-size: 0.8rem; color: #888;">{formatted_time}</p>'
-    
-            # Handle title safely
-            title = metadata.get('title', 'Untitled') or 'Untitled'
-            title = title[:100]  # Ensure it's a string and slice it safely
-    
-            # Generate card
-            tags_attr = "|".join(tags)  # Use pipe "|" as delimiter
-            cards_html += f"""
-            <div class="bookmark" data-tags="{tags_attr}" data-id="{link.id}">
-                {image_html}
-                <div class="bookmark-content">
-                    <h3><a href="{metadata.get('url', link.link)}" target="_blank">{title}</a></h3>
-                    <p>{(metadata.get('description') or '')[:200] + ("..." if metadata.get('description') and len(metadata.get('description')) > 200 else "")}</p>
-                    {price_html}
-                    {tags_html}
-                    {created_at_html}
-                </div>
-                <span class="delete-link" onclick="deleteLink({link.id})">🗑️</span>
-            </div>
-            """
-        return cards_html
+
+            description = metadata.get("description") or ""
+            if len(description) > 200:
+                description = description[:200] + "..."
+
+            price = metadata.get("price")
+            previous_price = metadata.get("previous_price")
+            if not previous_price or previous_price == price:
+                previous_price = None
+
+            images = metadata.get("images", [])
+            tags = metadata.get("tags", [])
+            for tag in tags:
+                tag_index.setdefault(tag, []).append(len(cards))
+
+            cards.append({
+                "id": link.id,
+                "url": metadata.get("url") or link.link,
+                "title": (metadata.get("title") or "Untitled")[:100],
+                "description": description,
+                "image": images[0] if images else None,
+                "price": price if price and price != "N/A" else None,
+                "previousPrice": previous_price,
+                "priceDirection": price_direction(price, previous_price) if previous_price else "",
+                "tags": tags,
+                "created": formatted_time,
+            })
+
+        data = json.dumps({"cards": cards, "tagIndex": tag_index}, ensure_ascii=False, default=str)
+        # Keep the JSON from closing the surrounding <script> element
+        return data.replace("</", "<\\/")
 
     def generate_scripts(chat_id):
         return f"""
         <script>
             const chatId = "{chat_id}";
-    
-            // Define filterByTag function
-            function filterByTag(tag) {{
-                const bookmarks = document.querySelectorAll('.bookmark');
-                const filters = document.querySelectorAll('.filter');
-            
-                // Update active filter
-                filters.forEach(filter => filter.classList.remove('active'));
-                document.querySelector(`.filter[onclick="filterByTag('${{tag}}')"]`).classList.add('active');
-            
-                // Filter bookmarks
-                bookmarks.forEach(bookmark => {{
-                    const tags = bookmark.getAttribute('data-tags').split('|'); // Use pipe "|" as delimiter
-                    if (tag === 'all' || tags.includes(tag)) {{
-                        bookmark.style.display = 'flex';
+
+            // Card data and tag -> card index shipped in the page
+            const bookmarkData = JSON.parse(document.getElementById('bookmark-data').textContent);
+            const cards = bookmarkData.cards;
+            const tagIndex = bookmarkData.tagIndex;
+            const allCardIndexes = cards.map((_, i) => i);
+            const cardIndexById = new Map(cards.map((card, i) => [card.id, i]));
+
+            // Virtualized list: only the rows around the viewport are in the DOM
+            const CARD_HEIGHT = 200;
+            const GAP = 16;
+            const MIN_CARD_WIDTH = 300;
+            const OVERSCAN_ROWS = 3;
+            const viewport = document.getElementById('bookmark-viewport');
+            const grid = viewport.querySelector('.bookmarks');
+            let visibleIndexes = allCardIndexes;
+            let activeTag = null;
+            let activeFilter = document.querySelector('.filter.active');
+            let columns = 1;
+            let renderedRange = null;
+            let renderScheduled = false;
+
+            function escapeHtml(value) {{
+                return String(value)
+                    .replace(/&/g, '&amp;')
+                    .replace(/</g, '&lt;')
+                    .replace(/>/g, '&gt;')
+                    .replace(/"/g, '&quot;')
+                    .replace(/'/g, '&#39;');
+            }}
+
+            function renderPrice(card) {{
+                if (!card.price) return '';
+                let change = '';
+                if (card.previousPrice) {{
+                    const previous = escapeHtml(card.previousPrice);
+                    if (card.priceDirection) {{
+                        const arrow = card.priceDirection === 'down' ? '▼' : '▲';
+                        change = ` <span class="price-change ${{card.priceDirection}}">${{arrow}} was $${{previous}}</span>`;
                     }} else {{
-                        bookmark.style.display = 'none';
+                        change = ` <span class="price-change">(was $${{previous}})</span>`;
                     }}
+                }}
+                return `<p class="price">Price: $${{escapeHtml(card.price)}}${{change}}</p>`;
+            }}
+
+            function renderCard(index) {{
+                const card = cards[index];
+                const image = card.image ? `<img src="${{escapeHtml(card.image)}}" alt="Image">` : '';
+                const tags = card.tags.map(tag => `<span class="tag">${{escapeHtml(tag)}}</span>`).join('');
+                const created = card.created ? `<p class="created-at">${{escapeHtml(card.created)}}</p>` : '';
+                return `
+                    <div class="bookmark" data-id="${{card.id}}">
+                        ${{image}}
+                        <div class="bookmark-content">
+                            <h3><a href="${{escapeHtml(card.url)}}" target="_blank">${{escapeHtml(card.title)}}</a></h3>
+                            <p class="description">${{escapeHtml(card.description)}}</p>
+                            ${{renderPrice(card)}}
+                            <div class="tags"><span class="add-tag" onclick="openTagDialog(${{card.id}})">+</span>${{tags}}</div>
+                            ${{created}}
+                        </div>
+                        <span class="delete-link" onclick="deleteLink(${{card.id}})">🗑️</span>
+                    </div>`;
+            }}
+
+            function layout() {{
+                columns = Math.max(1, Math.floor((viewport.clientWidth + GAP) / (MIN_CARD_WIDTH + GAP)));
+                grid.style.gridTemplateColumns = `repeat(${{columns}}, minmax(0, 1fr))`;
+                const rows = Math.ceil(visibleIndexes.length / columns);
+                viewport.style.height = rows ? `${{rows * (CARD_HEIGHT + GAP) - GAP}}px` : '0px';
+                renderedRange = null;
+                renderWindow();
+            }}
+
+            function renderWindow() {{
+                const stride = CARD_HEIGHT + GAP;
+                const top = viewport.getBoundingClientRect().top;
+                const firstRow = Math.max(0, Math.floor(-top / stride) - OVERSCAN_ROWS);
+                const lastRow = Math.max(firstRow, Math.ceil((window.innerHeight - top) / stride) + OVERSCAN_ROWS);
+                const start = Math.min(visibleIndexes.length, firstRow * columns);
+                const end = Math.min(visibleIndexes.length, lastRow * columns);
+                if (renderedRange && renderedRange[0] === start && renderedRange[1] === end) return;
+                renderedRange = [start, end];
+
+                let html = '';
+                for (let i = start; i < end; i++) {{
+                    html += renderCard(visibleIndexes[i]);
+                }}
+                grid.style.transform = `translateY(${{firstRow * stride}}px)`;
+                grid.innerHTML = html;
+            }}
+
+            function scheduleRender() {{
+                if (renderScheduled) return;
+                renderScheduled = true;
+                requestAnimationFrame(() => {{
+                    renderScheduled = false;
+                    renderWindow();
                 }});
             }}
-    
+
+            // Show all cards (tag === null) or only those carrying the tag
+            function filterByTag(tag, filterElement) {{
+                if (activeFilter) activeFilter.classList.remove('active');
+                activeFilter = filterElement;
+                if (activeFilter) activeFilter.classList.add('active');
+                activeTag = tag;
+                visibleIndexes = tag === null ? allCardIndexes : (tagIndex[tag] || []);
+                layout();
+            }}
+
+            document.querySelector('.filters').addEventListener('click', event => {{
+                const filter = event.target.closest('.filter');
+                if (!filter) return;
+                filterByTag(filter.dataset.all ? null : filter.dataset.tag, filter);
+            }});
+            window.addEventListener('scroll', scheduleRender, {{ passive: true }});
+            window.addEventListener('resize', () => requestAnimationFrame(layout));
+
+            // Record a tag added from this page in the card data and the tag index
+            function addTagToCard(linkId, tag) {{
+                const index = cardIndexById.get(linkId);
+                if (index === undefined || cards[index].tags.includes(tag)) return;
+                cards[index].tags.push(tag);
+
+                // Keep each index list in card order
+                const indexes = tagIndex[tag] || (tagIndex[tag] = []);
+                let low = 0, high = indexes.length;
+                while (low < high) {{
+                    const mid = (low + high) >> 1;
+                    if (indexes[mid] < index) low = mid + 1; else high = mid;
+                }}
+                indexes.splice(low, 0, index);
+
+                if (activeTag === tag) {{
+                    visibleIndexes = indexes;
+                    layout();
+                }} else {{
+                    renderedRange = null;
+                    renderWindow();
+                }}
+            }}
+
             // Refresh the filters bar dynamically
             function refreshFiltersBar() {{
                 fetch(`/get_tags/${{chatId}}`)
@@ -254,12 +421,14 @@ def generate_html(chat_id, user_links, link_metadata, first_name):
                     .then(tags => {{
                         const filtersContainer = document.querySelector('.filters');
                         if (filtersContainer) {{
-                            // Rebuild filters bar
-                            let filtersHtml = '<span class="filter active" onclick="filterByTag(&quot;all&quot;)">All</span>';
-                            tags.forEach(tag => {{
-                                filtersHtml += `<span class="filter" onclick="filterByTag(&quot;${{tag}}&quot;)">${{tag}}</span>`;
+                            // Rebuild filters bar, keeping the current filter selected
+                            let filtersHtml = `<span class="filter${{activeTag === null ? ' active' : ''}}" data-all="1">All</span>`;
+                            tags.sort().forEach(tag => {{
+                                const active = tag === activeTag ? ' active' : '';
+                                filtersHtml += `<span class="filter${{active}}" data-tag="${{escapeHtml(tag)}}">${{escapeHtml(tag)}}</span>`;
                             }});
                             filtersContainer.innerHTML = filtersHtml;
+                            activeFilter = filtersContainer.querySelector('.filter.active');
                         }}
                     }})
                     .catch(error => {{
@@ -289,7 +458,7 @@ def generate_html(chat_id, user_links, link_metadata, first_name):
             }}
     
             function openTagDialog(linkId) {{
-                const existingTags = Array.from(document.querySelectorAll('.filter:not(.active)')).map(tag => tag.innerText);
+                const existingTags = Object.keys(tagIndex).sort();
                 let tag = prompt(`Choose Existing tag:\n${{existingTags.join(', ')}}\n Or enter manually`, "");
             
                 if (tag) {{
@@ -303,12 +472,7 @@ def generate_html(chat_id, user_links, link_metadata, first_name):
                     .then(response => response.json())
                     .then(data => {{
                         if (data.message === "Tag added successfully!") {{
-                            const bookmark = document.querySelector(`.bookmark[data-id="${{linkId}}"]`);
-                            if (bookmark) {{
-                                const tagsContainer = bookmark.querySelector('.tags');
-                                const newTagHtml = `<span class="tag">${{tag}}</span>`;
-                                tagsContainer.insertAdjacentHTML('beforeend', newTagHtml);
-                            }}
+                            addTagToCard(linkId, tag);
                             refreshFiltersBar(); // Refresh the filters bar dynamically
                         }} else {{
                             alert("Failed to add tag.");
@@ -338,6 +502,8 @@ def generate_html(chat_id, user_links, link_metadata, first_name):
                         }});
                 }}
             }}
+
+            layout();
         </script>
         """
 
@@ -357,23 +523,22 @@ def generate_html(chat_id, user_links, link_metadata, first_name):
     <body>
         <div class="container">
             {generate_tag_filters()}
-            <div class="bookmarks">
-                {generate_bookmark_cards()}
+            <div id="bookmark-viewport">
+                <div class="bookmarks"></div>
             </div>
             <div class="actions">
                 <button class="delete-all" onclick="deleteAllLinks()">Delete All Links</button>
             </div>
         </div>
+        <script type="application/json" id="bookmark-data">{generate_bookmark_data()}</script>
         {generate_scripts(chat_id)}
     </body>
     </html>
     """
 
     # Save the HTML file
-    file_path = os.path.join(directory, f"{chat_id}_history.html")
-    with open(file_path, "w") as file:
-        file.write(history_html)
+    storage.write(history_filename(chat_id), history_html)
 
-    return f"https://flask-production-4c83.up.railway.app/storage/links_history/{chat_id}_history.html"
+    return history_url(chat_id)
 
 
@@ -0,0 +1,175 @@
+import os
+import hashlib
+import tempfile
+from abc import ABC, abstractmethod
+
+FSYNC_POLICIES = ("none", "file", "full")
+
+
+class HistoryStorage(ABC):
+    """Where rendered history pages are kept, addressed by file name."""
+
+    @abstractmethod
+    def write(self, name, content):
+        """Store the page, replacing any previous content in one step."""
+
+    @abstractmethod
+    def read(self, name):
+        """Return the stored content, or None if there is none."""
+
+    @abstractmethod
+    def delete(self, name):
+        """Remove the page if it exists."""
+
+
+class ShardedFileStorage(HistoryStorage):
+    """Pages on local disk, fanned out into hashed subdirectories.
+
+    `root/3f/a2/<name>` keeps each directory small however many chats there
+    are. Writes go to a temporary file in the same directory and are
+    published with `os.replace`, so readers see either the old or the new
+    page, never a partial one.
+
+    fsync policies: "none" leaves flushing to the OS, "file" syncs the page
+    before it is published, "full" also syncs the directory afterwards so the
+    rename itself survives a crash.
+    """
+
+    def __init__(self, root, levels=2, fsync="file", legacy_fallback=True, **options):
+        _check_fsync_policy(fsync)
+        self.root = root
+        self.levels = levels
+        self.fsync = fsync
+        # Pages written before sharding live directly in `root`
+        self.legacy_fallback = legacy_fallback
+
+    def path_for(self, name):
+        _check_name(name)
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+        shards = [digest[i * 2:i * 2 + 2] for i in range(self.levels)]
+        return os.path.join(self.root, *shards, name)
+
+    def write(self, name, content):
+        _write_atomically(self.path_for(name), content, self.fsync)
+
+    def read(self, name):
+        for path in self._candidate_paths(name):
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    return file.read()
+            except FileNotFoundError:
+                continue
+        return None
+
+    def delete(self, name):
+        for path in self._candidate_paths(name):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _candidate_paths(self, name):
+        yield self.path_for(name)
+        if self.legacy_fallback:
+            yield os.path.join(self.root, name)
+
+
+class LocalObjectStore(HistoryStorage):
+    """Stand-in for an object store: one flat key per page in a shared directory.
+
+    Pages are replaced whole, like objects in a bucket, and every worker
+    pointed at the same directory sees the same pages.
+    """
+
+    def __init__(self, root, fsync="file", **options):
+        _check_fsync_policy(fsync)
+        self.root = root
+        self.fsync = fsync
+
+    def write(self, name, content):
+        _check_name(name)
+        _write_atomically(os.path.join(self.root, name), content, self.fsync)
+
+    def read(self, name):
+        _check_name(name)
+        try:
+            with open(os.path.join(self.root, name), "r", encoding="utf-8") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, name):
+        _check_name(name)
+        try:
+            os.unlink(os.path.join(self.root, name))
+        except FileNotFoundError:
+            pass
+
+
+STORAGE_BACKENDS = {
+    "sharded": ShardedFileStorage,
+    "object": LocalObjectStore,
+}
+
+
+def register_backend(backend_name, factory):
+    """Make another HistoryStorage implementation available to create_storage.
+
+    `factory(**options)` receives every option given to create_storage and
+    should ignore the ones it has no use for.
+    """
+    STORAGE_BACKENDS[backend_name] = factory
+
+
+def create_storage(backend_name, **options):
+    """Build the named backend, passing it all options."""
+    try:
+        factory = STORAGE_BACKENDS[backend_name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown history storage backend {backend_name!r}, use one of: {', '.join(STORAGE_BACKENDS)}"
+        )
+    return factory(**options)
+
+
+def _check_name(name):
+    if not name or "/" in name or "\\" in name or name.startswith("."):
+        raise ValueError(f"Invalid page name {name!r}")
+
+
+def _check_fsync_policy(fsync):
+    if fsync not in FSYNC_POLICIES:
+        raise ValueError(f"Unknown fsync policy {fsync!r}, use one of: {', '.join(FSYNC_POLICIES)}")
+
+
+def _write_atomically(path, content, fsync):
+    """Write to a temporary file next to `path` and publish it with os.replace."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            file.write(content)
+            if fsync != "none":
+                file.flush()
+                os.fsync(file.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    if fsync == "full":
+        _fsync_directory(directory)
+
+
+def _fsync_directory(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
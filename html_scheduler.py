@@ -0,0 +1,107 @@
+import time
+import threading
+
+
+class RegenerationScheduler:
+    """Coalesce history page renders per chat.
+
+    `mark_dirty` records that a chat's page is out of date. A background
+    thread renders the chat once no further mutation has arrived for `delay`
+    seconds, or at the latest `max_delay` seconds after the first one, so a
+    burst of saves and tag taps costs a single render.
+    """
+
+    def __init__(self, render, delay=1.0, max_delay=5.0):
+        self._render = render
+        self.delay = delay
+        self.max_delay = max_delay
+        self._pending = {}  # chat_id -> (first_marked_at, due_at, first_name)
+        # Chats being rendered right now. A chat is never rendered by two
+        # threads at once, so an older render can't overwrite a newer page.
+        self._rendering = set()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def mark_dirty(self, chat_id, first_name=None):
+        """Schedule a render of the chat's page."""
+        now = time.monotonic()
+        with self._cond:
+            first_marked_at, _, previous_name = self._pending.get(chat_id, (now, None, None))
+            due_at = min(now + self.delay, first_marked_at + self.max_delay)
+            self._pending[chat_id] = (first_marked_at, due_at, first_name or previous_name)
+            if self.delay > 0:
+                self._ensure_thread()
+                self._cond.notify_all()
+        if self.delay <= 0:
+            self.flush_chat(chat_id)
+
+    def flush_chat(self, chat_id):
+        """Render the chat now if it has a pending render. Returns True if it did.
+
+        Waits for a render of the chat already in progress, then renders again
+        only if the chat was marked dirty meanwhile.
+        """
+        with self._cond:
+            while chat_id in self._rendering:
+                self._cond.wait()
+            entry = self._pending.pop(chat_id, None)
+            if entry is None:
+                return False
+            self._rendering.add(chat_id)
+        self._render_claimed(chat_id, entry[2])
+        return True
+
+    def flush(self):
+        """Render every pending chat now."""
+        with self._cond:
+            chat_ids = list(self._pending)
+        for chat_id in chat_ids:
+            self.flush_chat(chat_id)
+
+    def _ensure_thread(self):
+        # Started lazily so each gunicorn worker gets its own thread after fork
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="html-regeneration", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                # Chats marked dirty while rendering stay pending until the render ends
+                waiting = {
+                    chat_id: entry for chat_id, entry in self._pending.items()
+                    if chat_id not in self._rendering
+                }
+                if not waiting:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                next_due = min(due_at for _, due_at, _ in waiting.values())
+                if next_due > now:
+                    self._cond.wait(next_due - now)
+                    continue
+                due = [
+                    (chat_id, first_name)
+                    for chat_id, (_, due_at, first_name) in waiting.items()
+                    if due_at <= now
+                ]
+                for chat_id, _ in due:
+                    del self._pending[chat_id]
+                    self._rendering.add(chat_id)
+
+            for chat_id, first_name in due:
+                self._render_claimed(chat_id, first_name)
+
+    def _render_claimed(self, chat_id, first_name):
+        try:
+            self._safe_render(chat_id, first_name or "User")
+        finally:
+            with self._cond:
+                self._rendering.discard(chat_id)
+                self._cond.notify_all()
+
+    def _safe_render(self, chat_id, first_name):
+        try:
+            self._render(chat_id, first_name)
+        except Exception as e:
+            print(f"HTML regeneration error for chat {chat_id}: {e}")
@@ -0,0 +1,401 @@
+"""Replay Telegram updates against the app under gunicorn and report latency percentiles.
+
+Starts fake SOAX/Telegram servers (fake_upstreams.py) and gunicorn pointed at
+them with a scratch SQLite database, then sends a synthetic or recorded
+stream of updates at a fixed rate and reports, per route, throughput,
+p50/p95/p99 latency and error rates, along with worker saturation.
+
+    python load_replay.py --rate 20 --duration 60 --workers 2 --threads 4
+    python load_replay.py --rate 50 --soax-latency-ms 1500 --soax-error-rate 0.05
+    python load_replay.py --stream updates.ndjson --rate 30
+    python load_replay.py --target http://localhost:8000 --rate 10   # an app you started yourself
+
+A recorded stream is NDJSON. Each line is either a raw Telegram update, which
+is POSTed to /webhook, or a request spec such as
+{"route": "history_page", "method": "GET", "path": "/storage/links_history/1_history.html"}.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import fake_upstreams
+
+# Share of each kind of synthetic request
+DEFAULT_MIX = {"link": 0.4, "callback": 0.3, "history_page": 0.2, "delete": 0.1}
+
+
+class SyntheticWorkload:
+    """Generate link saves, tag taps, deletes and page views for a pool of chats.
+
+    Link IDs for tag taps and deletes are learned from the inline keyboards
+    the webhook returns, so only IDs that exist are used.
+    """
+
+    def __init__(self, page_base_url, chats=50, mix=None, amazon_share=0.3, seed=None):
+        self.page_base_url = page_base_url
+        self.chats = [str(100000 + i) for i in range(chats)]
+        self.mix = mix or DEFAULT_MIX
+        self.amazon_share = amazon_share
+        self.tags = ["gift", "tech", "home", "books", "later", "deal", "kids", "travel"]
+        self._rng = random.Random(seed)
+        self._links = defaultdict(list)  # chat_id -> link IDs
+        self._lock = threading.Lock()
+        self._update_id = 0
+
+    def next_request(self):
+        with self._lock:
+            chat_id = self._rng.choice(self.chats)
+            kind = self._rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+            link_ids = self._links[chat_id]
+            # Chats without saved links have nothing to tag, delete or view yet
+            if kind != "link" and not link_ids:
+                kind = "link"
+
+            if kind == "link":
+                return "webhook:link", "POST", "/webhook", self._message(chat_id)
+            if kind == "callback":
+                link_id = self._rng.choice(link_ids)
+                return "webhook:callback", "POST", "/webhook", self._callback(chat_id, link_id)
+            if kind == "delete":
+                link_id = link_ids.pop(self._rng.randrange(len(link_ids)))
+                return "delete_link", "DELETE", f"/delete_link/{link_id}", None
+            return "history_page", "GET", f"/storage/links_history/{chat_id}_history.html", None
+
+    def observe(self, route, body, payload):
+        """Remember the link ID offered in a webhook reply's keyboard."""
+        if route != "webhook:link" or not isinstance(body, dict):
+            return
+        for row in (body.get("reply_markup") or {}).get("inline_keyboard", []):
+            for button in row:
+                data = button.get("callback_data", "")
+                if data.startswith("add_tag:"):
+                    chat_id = str(payload["message"]["chat"]["id"])
+                    link_id = int(data.split(":")[1])
+                    with self._lock:
+                        if link_id not in self._links[chat_id]:
+                            self._links[chat_id].append(link_id)
+                    return
+
+    def _message(self, chat_id):
+        if self._rng.random() < self.amazon_share:
+            asin = "B0" + "".join(self._rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789") for _ in range(8))
+            link = f"https://www.amazon.com/dp/{asin}?tag=loadtest-20"
+        else:
+            link = f"{self.page_base_url}/page/{self._rng.randrange(1_000_000)}"
+        hashtags = " ".join(f"#{tag}" for tag in self._rng.sample(self.tags, self._rng.randint(0, 3)))
+        return self._update({"message": {
+            "message_id": self._update_id,
+            "chat": {"id": int(chat_id), "first_name": "Load"},
+            "text": f"{link} {hashtags}".strip(),
+        }})
+
+    def _callback(self, chat_id, link_id):
+        return self._update({"callback_query": {
+            "id": str(self._update_id),
+            "data": f"tag:{link_id}:{self._rng.choice(self.tags)}",
+            "message": {"chat": {"id": int(chat_id)}},
+        }})
+
+    def _update(self, update):
+        self._update_id += 1
+        return dict(update, update_id=self._update_id)
+
+
+class RecordedWorkload:
+    """Replay a recorded NDJSON stream, looping when it runs out."""
+
+    def __init__(self, path):
+        with open(path) as file:
+            self.entries = [json.loads(line) for line in file if line.strip()]
+        if not self.entries:
+            raise ValueError(f"No requests in {path}")
+        self._position = 0
+        self._lock = threading.Lock()
+
+    def next_request(self):
+        with self._lock:
+            entry = self.entries[self._position % len(self.entries)]
+            self._position += 1
+        if "route" in entry:
+            return entry["route"], entry.get("method", "GET"), entry["path"], entry.get("json")
+        route = "webhook:callback" if "callback_query" in entry else "webhook:link"
+        return route, "POST", "/webhook", entry
+
+    def observe(self, route, body, payload):
+        pass
+
+
+class Results:
+    def __init__(self):
+        self.latencies = defaultdict(list)  # route -> seconds, successful requests only
+        self.statuses = defaultdict(lambda: defaultdict(int))  # route -> status -> count
+        self.schedule_lag = []
+        self.in_flight_samples = []
+        self._lock = threading.Lock()
+
+    def record(self, route, status, latency):
+        with self._lock:
+            self.statuses[route][status] += 1
+            if isinstance(status, int) and status < 400:
+                self.latencies[route].append(latency)
+
+
+def run_load(workload, base_url, rate, duration, concurrency, timeout):
+    """Send requests at `rate` per second for `duration` seconds (open loop)."""
+    results = Results()
+    slots = threading.BoundedSemaphore(concurrency)
+    in_flight = [0]
+    in_flight_lock = threading.Lock()
+    session_local = threading.local()
+    stop_sampling = threading.Event()
+
+    def session():
+        if not hasattr(session_local, "session"):
+            session_local.session = requests.Session()
+        return session_local.session
+
+    def send(route, method, path, payload):
+        started_at = time.perf_counter()
+        try:
+            response = session().request(method, base_url + path, json=payload, timeout=timeout)
+            status = response.status_code
+            body = response.json() if "json" in response.headers.get("Content-Type", "") else None
+            workload.observe(route, body, payload)
+        except requests.exceptions.Timeout:
+            status = "timeout"
+        except requests.exceptions.RequestException as e:
+            status = type(e).__name__
+        results.record(route, status, time.perf_counter() - started_at)
+        with in_flight_lock:
+            in_flight[0] -= 1
+        slots.release()
+
+    def sample_in_flight():
+        while not stop_sampling.wait(0.1):
+            results.in_flight_samples.append(in_flight[0])
+
+    sampler = threading.Thread(target=sample_in_flight, daemon=True)
+    sampler.start()
+    interval = 1.0 / rate
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        sent = 0
+        while True:
+            scheduled_at = started_at + sent * interval
+            if scheduled_at - started_at >= duration:
+                break
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            # Blocks when every client slot is busy; the lag shows the client fell behind
+            slots.acquire()
+            results.schedule_lag.append(max(0.0, time.perf_counter() - scheduled_at))
+            with in_flight_lock:
+                in_flight[0] += 1
+            executor.submit(send, *workload.next_request())
+            sent += 1
+    elapsed = time.perf_counter() - started_at
+    stop_sampling.set()
+    return results, elapsed
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile: the smallest value with at least p% of values at or below it."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def build_report(results, elapsed, capacity, cpu_seconds=None, upstreams=None):
+    routes = {}
+    total = errors = 0
+    for route in sorted(results.statuses):
+        statuses = results.statuses[route]
+        count = sum(statuses.values())
+        failed = sum(n for status, n in statuses.items() if not isinstance(status, int) or status >= 400)
+        latencies = sorted(results.latencies[route])
+        routes[route] = {
+            "requests": count,
+            "throughput_rps": round(count / elapsed, 2),
+            "error_rate": round(failed / count, 4) if count else 0.0,
+            "statuses": {str(status): n for status, n in sorted(statuses.items(), key=str)},
+            **{f"p{p}_ms": _ms(percentile(latencies, p)) for p in (50, 95, 99)},
+            "max_ms": _ms(latencies[-1] if latencies else None),
+        }
+        total += count
+        errors += failed
+
+    lag = sorted(results.schedule_lag)
+    samples = results.in_flight_samples
+    report = {
+        "elapsed_s": round(elapsed, 2),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "routes": routes,
+        "saturation": {
+            "server_capacity": capacity,
+            "mean_in_flight": round(sum(samples) / len(samples), 2) if samples else 0.0,
+            "peak_in_flight": max(samples) if samples else 0,
+            # Share of gunicorn worker threads kept busy, on average
+            "worker_utilization": round(sum(samples) / len(samples) / capacity, 3) if samples and capacity else None,
+            "client_schedule_lag_p95_ms": _ms(percentile(lag, 95)),
+        },
+    }
+    if cpu_seconds is not None:
+        report["saturation"]["server_cpu_cores_used"] = round(cpu_seconds / elapsed, 2)
+    if upstreams is not None:
+        report["upstream_calls"] = {
+            service: {"requests": upstreams.requests[service], "errors": upstreams.errors[service]}
+            for service in fake_upstreams.SERVICES
+        }
+    return report
+
+
+def print_report(report):
+    print(f"\n{report['requests']} requests in {report['elapsed_s']}s: "
+          f"{report['throughput_rps']} req/s, {report['error_rate']:.2%} errors\n")
+    header = f"{'route':<18}{'reqs':>7}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for route, stats in report["routes"].items():
+        print(f"{route:<18}{stats['requests']:>7}{stats['throughput_rps']:>8}"
+              f"{_fmt(stats['p50_ms']):>9}{_fmt(stats['p95_ms']):>9}{_fmt(stats['p99_ms']):>9}"
+              f"{_fmt(stats['max_ms']):>9}{stats['error_rate']:>8.2%}")
+    print("\nsaturation:", json.dumps(report["saturation"]))
+    if "upstream_calls" in report:
+        print("upstream calls:", json.dumps(report["upstream_calls"]))
+
+
+def start_app(args, upstreams_url, workdir):
+    """Start gunicorn with the app pointed at the fake upstreams and a scratch database."""
+    env = dict(
+        os.environ,
+        DATABASE_URL=args.database_url or f"sqlite:///{os.path.join(workdir, 'load.db')}",
+        SOAX_API_BASE=upstreams_url,
+        TELEGRAM_API_BASE=upstreams_url,
+        # The fake pages live on 127.0.0.1, which the app otherwise refuses to fetch
+        DIRECT_FETCH_ALLOWED_HOSTS="127.0.0.1",
+        HISTORY_STORAGE_DIR=os.path.join(workdir, "links_history"),
+        PROFILE_DIR=os.path.join(workdir, "profiles"),
+    )
+    command = [
+        sys.executable, "-m", "gunicorn", "main:app",
+        "--bind", f"127.0.0.1:{args.port}",
+        "--workers", str(args.workers),
+        "--threads", str(args.threads),
+        "--timeout", "120",
+        "--log-level", "warning",
+    ]
+    log = open(os.path.join(workdir, "gunicorn.log"), "w")
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited, see {log.name}")
+        try:
+            requests.get(base_url + "/create_db", timeout=5).raise_for_status()
+            return process, base_url
+        except requests.exceptions.RequestException:
+            time.sleep(0.3)
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not start within 30s, see {log.name}")
+
+
+def process_tree_cpu_seconds(pid):
+    """User + system CPU seconds of a process and its children, from /proc (Linux only)."""
+    try:
+        pids = [pid] + [int(child) for child in open(f"/proc/{pid}/task/{pid}/children").read().split()]
+        ticks = 0
+        for process_id in pids:
+            fields = open(f"/proc/{process_id}/stat").read().rsplit(")", 1)[1].split()
+            ticks += int(fields[11]) + int(fields[12])  # utime, stime
+        return ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=10, help="requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to send for")
+    parser.add_argument("--concurrency", type=int, default=64, help="max requests in flight from the client")
+    parser.add_argument("--timeout", type=float, default=30, help="per-request client timeout in seconds")
+    parser.add_argument("--stream", help="NDJSON file of recorded updates to replay instead of synthetic ones")
+    parser.add_argument("--chats", type=int, default=50, help="synthetic chats")
+    parser.add_argument("--mix", help='synthetic request mix as JSON, e.g. {"link": 0.5, "history_page": 0.5}')
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--target", help="base URL of an already running app; skips gunicorn and the fakes")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=1, help="gunicorn threads per worker")
+    parser.add_argument("--port", type=int, default=8765, help="port for gunicorn")
+    parser.add_argument("--database-url", help="database for the app (default: scratch SQLite)")
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    fake_upstreams.add_arguments(parser)
+    args = parser.parse_args()
+
+    upstreams = process = None
+    workdir = tempfile.mkdtemp(prefix="enrichly-load-")
+    try:
+        if args.target:
+            base_url = args.target.rstrip("/")
+            page_base_url = base_url
+            capacity = None
+        else:
+            upstreams = fake_upstreams.FakeUpstreams(
+                behaviours=fake_upstreams.behaviours_from_args(args), seed=args.seed
+            ).start()
+            process, base_url = start_app(args, upstreams.base_url, workdir)
+            page_base_url = upstreams.base_url
+            capacity = args.workers * args.threads
+
+        if args.stream:
+            workload = RecordedWorkload(args.stream)
+        else:
+            mix = json.loads(args.mix) if args.mix else None
+            workload = SyntheticWorkload(page_base_url, chats=args.chats, mix=mix, seed=args.seed)
+
+        print(f"Sending {args.rate} req/s for {args.duration}s to {base_url} (scratch files in {workdir})")
+        cpu_before = process_tree_cpu_seconds(process.pid) if process else None
+        results, elapsed = run_load(workload, base_url, args.rate, args.duration, args.concurrency, args.timeout)
+        cpu_after = process_tree_cpu_seconds(process.pid) if process else None
+        cpu_seconds = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+
+        report = build_report(results, elapsed, capacity, cpu_seconds, upstreams)
+        print_report(report)
+        if args.json_path:
+            with open(args.json_path, "w") as file:
+                json.dump(report, file, indent=2)
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+        if upstreams:
+            upstreams.stop()
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:.1f}"
+
+
+if __name__ == "__main__":
+    main()
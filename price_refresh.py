@@ -0,0 +1,80 @@
+import re
+import time
+import threading
+
+PRICE_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+class PriceRefresher:
+    """Refresh stale product prices at a steady rate.
+
+    Every minute `select_batch(limit)` is asked for up to `budget_per_minute`
+    products, most urgent first, and `refresh(product)` is called for them
+    one at a time, spaced evenly across the minute so upstream load never
+    arrives in bursts.
+    """
+
+    def __init__(self, select_batch, refresh, budget_per_minute=10, idle_interval=60):
+        self._select_batch = select_batch
+        self._refresh = refresh
+        self.budget_per_minute = budget_per_minute
+        self.idle_interval = idle_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.budget_per_minute <= 0:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="price-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        """Refresh one minute's worth of products. Returns how many were refreshed."""
+        interval = 60.0 / self.budget_per_minute
+        try:
+            batch = self._select_batch(self.budget_per_minute)
+        except Exception as e:
+            print(f"Price refresh selection error: {e}")
+            return 0
+
+        for i, product in enumerate(batch):
+            if i and self._stop.wait(interval):
+                return i
+            try:
+                self._refresh(product)
+            except Exception as e:
+                print(f"Price refresh error for {product}: {e}")
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            started_at = time.monotonic()
+            if not self.run_once():
+                self._stop.wait(self.idle_interval)
+                continue
+            # Keep to the per-minute budget even when a batch finished early
+            self._stop.wait(max(0.0, 60.0 - (time.monotonic() - started_at)))
+
+
+def parse_price(price):
+    """Return a price string such as "$1,299.99" as a float, or None."""
+    if price is None:
+        return None
+    match = PRICE_NUMBER_RE.search(str(price))
+    if not match:
+        return None
+    number = match.group(0)
+    # The last separator is the decimal point when one or two digits follow it;
+    # with three it groups thousands, as in "1,299"
+    decimals = re.search(r"[.,](\d{1,2})$", number)
+    if decimals:
+        integer_part = number[:decimals.start()]
+        number = re.sub(r"[.,]", "", integer_part) + "." + decimals.group(1)
+    else:
+        number = re.sub(r"[.,]", "", number)
+    return float(number)
@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+import time
+import random
+import threading
+import functools
+from collections import Counter
+from datetime import datetime
+
+
+class StackTracer:
+    """Record self time per call stack for the current thread via sys.setprofile.
+
+    Tracing rather than sampling keeps short requests visible; the cost is
+    only paid while a trace is running.
+    """
+
+    def __init__(self):
+        self.stacks = Counter()  # folded stack -> self time in seconds
+        self._path = []
+        self._last = None
+
+    def start(self):
+        self._path = _stack_labels(sys._getframe())
+        self._last = time.perf_counter()
+        sys.setprofile(self._trace)
+
+    def stop(self):
+        sys.setprofile(None)
+        self._charge()
+
+    def _charge(self):
+        now = time.perf_counter()
+        self.stacks[";".join(self._path)] += now - self._last
+        self._last = now
+
+    def _trace(self, frame, event, arg):
+        self._charge()
+        if event == "call":
+            self._path.append(_label(frame.f_code))
+        elif event == "c_call":
+            self._path.append(f"{getattr(arg, '__qualname__', repr(arg))} (builtin)")
+        elif self._path:
+            # return, c_return, c_exception
+            self._path.pop()
+
+
+class Profile:
+    """One captured run: time spent in every traced call stack plus the SQL statements it issued."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.perf_counter()
+        self.duration = None
+        self.sql = []
+        self._tracer = StackTracer()
+        self._tracer.start()
+
+    def finish(self):
+        self._tracer.stop()
+        self.duration = time.perf_counter() - self.started_at
+
+    @property
+    def stacks(self):
+        return self._tracer.stacks
+
+
+class Profiler:
+    """Opt-in per-request profiling, written as flamegraph folded-stack files.
+
+    Each profile produces `<stem>.folded` (stacks weighted by microseconds of
+    self time, for flamegraph.pl or speedscope) and `<stem>.sql.json`.
+
+    A run is profiled when the caller passes the trigger token, when it is
+    picked by `sample_rate`, or while `arm()`ed runs remain. Otherwise the
+    only cost is the checks in `should_profile`.
+    """
+
+    def __init__(self, directory, token=None, sample_rate=0.0, max_files=200):
+        self.directory = directory
+        self.token = token
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self._armed = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def should_profile(self, trigger=None):
+        if trigger and self.token and trigger == self.token:
+            return True
+        if self._armed:
+            with self._lock:
+                if self._armed > 0:
+                    self._armed -= 1
+                    return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @property
+    def active(self):
+        """Whether the current thread is being profiled."""
+        return getattr(self._local, "profile", None) is not None
+
+    def arm(self, count):
+        """Profile the next `count` runs."""
+        with self._lock:
+            self._armed = max(0, count)
+
+    def start(self, name):
+        profile = Profile(name)
+        self._local.profile = profile
+        return profile
+
+    def stop(self, profile):
+        """Finish a profile, write it out and return its file name stem."""
+        profile.finish()
+        if getattr(self._local, "profile", None) is profile:
+            self._local.profile = None
+        return self._write(profile)
+
+    def record_sql(self, statement, duration):
+        profile = getattr(self._local, "profile", None)
+        if profile is not None:
+            profile.sql.append({"statement": statement, "duration_ms": round(duration * 1000, 3)})
+
+    def profiled(self, name):
+        """Decorator that profiles calls to a function when `should_profile()` picks them."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if self.active or not self.should_profile():
+                    return func(*args, **kwargs)
+                profile = self.start(name)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.stop(profile)
+            return wrapper
+        return decorator
+
+    def list_profiles(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted((name for name in names if not name.startswith(".")), reverse=True)
+
+    def _write(self, profile):
+        os.makedirs(self.directory, exist_ok=True)
+        stem = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{_safe_name(profile.name)}"
+
+        with open(os.path.join(self.directory, f"{stem}.folded"), "w") as file:
+            for stack, seconds in profile.stacks.most_common():
+                microseconds = round(seconds * 1_000_000)
+                if stack and microseconds:
+                    file.write(f"{stack} {microseconds}\n")
+        with open(os.path.join(self.directory, f"{stem}.sql.json"), "w") as file:
+            json.dump({
+                "name": profile.name,
+                "duration_ms": round(profile.duration * 1000, 3),
+                "sql_count": len(profile.sql),
+                "sql_ms": round(sum(query["duration_ms"] for query in profile.sql), 3),
+                "sql": profile.sql,
+            }, file, indent=2)
+
+        self._prune()
+        return stem
+
+    def _prune(self):
+        names = self.list_profiles()
+        for name in names[self.max_files:]:
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def _stack_labels(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    return labels[::-1]
+
+
+def _label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _safe_name(name):
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in name or "request")
@@ -0,0 +1,117 @@
+import re
+import time
+import socket
+import ipaddress
+from urllib.parse import urlsplit, urlunsplit, urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ALLOWED_SCHEMES = ("http", "https")
+HEAD_END_RE = re.compile(rb"</head\s*>", re.IGNORECASE)
+CHUNK_SIZE = 16 * 1024
+
+
+class UnsafeURLError(ValueError):
+    """The URL points somewhere the app must not fetch from, such as a private network."""
+
+
+def check_url(url, allowed_hosts=()):
+    """Raise UnsafeURLError unless `url` is http(s) and every address it resolves to is public.
+
+    Hosts in `allowed_hosts` skip the address check, for local test servers.
+    """
+    resolve_checked_address(url, allowed_hosts)
+
+
+def resolve_checked_address(url, allowed_hosts=()):
+    """Resolve the URL's host, check it as `check_url` does and return an address to connect to."""
+    parts = urlsplit(url)
+    if parts.scheme.lower() not in ALLOWED_SCHEMES:
+        raise UnsafeURLError(f"Only http and https links can be fetched, not {parts.scheme or 'no scheme'!r}")
+    host = (parts.hostname or "").lower().rstrip(".")
+    if not host:
+        raise UnsafeURLError(f"No host in {url!r}")
+
+    try:
+        port = parts.port or (443 if parts.scheme.lower() == "https" else 80)
+        addresses = [info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)]
+    except (socket.gaierror, ValueError) as e:
+        raise UnsafeURLError(f"Could not resolve {host}: {e}")
+    if not addresses:
+        raise UnsafeURLError(f"Could not resolve {host}")
+    if host not in allowed_hosts:
+        for address in addresses:
+            ip = ipaddress.ip_address(address.split("%", 1)[0])
+            if getattr(ip, "ipv4_mapped", None):
+                ip = ip.ipv4_mapped
+            if not ip.is_global or ip.is_multicast:
+                raise UnsafeURLError(f"{host} resolves to non-public address {ip}")
+    return addresses[0]
+
+
+def fetch_html(url, headers=None, timeout=5, total_timeout=10, max_bytes=512 * 1024,
+               max_redirects=5, allowed_hosts=()):
+    """GET a page's HTML, reading at most `max_bytes` and stopping after </head>.
+
+    Redirects are followed by hand so every hop passes the address check,
+    and each hop connects to the address that was checked rather than
+    resolving the name again, so a DNS answer that changes between the check
+    and the connection (DNS rebinding) can't reach a private address.
+    `timeout` bounds each socket read; `total_timeout` bounds the whole
+    fetch, so a server dripping bytes can't hold the worker.
+    """
+    deadline = time.monotonic() + total_timeout
+    for _ in range(max_redirects + 1):
+        address = resolve_checked_address(url, allowed_hosts)
+        with requests.Session() as session, _get_pinned(session, url, address, headers, timeout) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers["Location"])
+                continue
+            response.raise_for_status()
+            body = _read_head(response, max_bytes, deadline)
+            return body.decode(response.encoding or "utf-8", errors="replace")
+    raise requests.exceptions.TooManyRedirects(f"More than {max_redirects} redirects")
+
+
+class _PinnedHostAdapter(HTTPAdapter):
+    """Verify TLS against the original host name while connecting to an IP address."""
+
+    def __init__(self, hostname, **kwargs):
+        self._hostname = hostname
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["server_hostname"] = self._hostname
+        kwargs["assert_hostname"] = self._hostname
+        super().init_poolmanager(*args, **kwargs)
+
+
+def _get_pinned(session, url, address, headers, timeout):
+    parts = urlsplit(url)
+    host = f"[{address}]" if ":" in address else address
+    port = f":{parts.port}" if parts.port else ""
+    pinned_url = urlunsplit((parts.scheme, host + port, parts.path or "/", parts.query, ""))
+
+    # A proxy from the environment would resolve the name again itself
+    session.trust_env = False
+    if parts.scheme.lower() == "https":
+        session.mount("https://", _PinnedHostAdapter(parts.hostname))
+    headers = dict(headers or {}, Host=(f"[{parts.hostname}]" if ":" in parts.hostname else parts.hostname) + port)
+    return session.get(pinned_url, headers=headers, timeout=timeout, stream=True, allow_redirects=False)
+
+
+def _read_head(response, max_bytes, deadline):
+    body = bytearray()
+    for chunk in response.iter_content(CHUNK_SIZE):
+        # Start the search a little before the new chunk in case the tag spans two chunks
+        search_from = max(0, len(body) - 8)
+        body += chunk
+        head_end = HEAD_END_RE.search(body, search_from)
+        if head_end:
+            return bytes(body[:head_end.end()])
+        if len(body) >= max_bytes:
+            break
+        if time.monotonic() > deadline:
+            raise requests.exceptions.Timeout("Page took too long to download")
+    return bytes(body[:max_bytes])
@@ -0,0 +1,49 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class TagSuggestionCache:
+    """Small per-process LRU cache of each chat's top tag names.
+
+    Entries are invalidated whenever the chat's tag usage changes and also
+    expire after `ttl` seconds, so other workers' writes are picked up.
+    """
+
+    def __init__(self, max_chats=1024, ttl=300):
+        self.max_chats = max_chats
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chat_id):
+        """Return the cached tag names for a chat, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is None:
+                return None
+            stored_at, tag_names = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[chat_id]
+                return None
+            self._entries.move_to_end(chat_id)
+            return tag_names
+
+    def set(self, chat_id, tag_names):
+        with self._lock:
+            self._entries[chat_id] = (time.monotonic(), list(tag_names))
+            self._entries.move_to_end(chat_id)
+            while len(self._entries) > self.max_chats:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, chat_id):
+        with self._lock:
+            self._entries.pop(chat_id, None)
+
+    def get_or_load(self, chat_id, loader):
+        """Return the chat's tag names, calling `loader(chat_id)` on a miss."""
+        tag_names = self.get(chat_id)
+        if tag_names is None:
+            tag_names = loader(chat_id)
+            self.set(chat_id, tag_names)
+        return tag_names
@@ -0,0 +1,52 @@
+class ReplyComposer:
+    """Collect the Bot API calls an update needs and answer with as few requests as possible.
+
+    Consecutive messages to the same chat are merged into one message. The
+    last call is returned as the webhook response body, which Telegram
+    executes itself once the response arrives. Any earlier calls go out
+    through `send(method, payload)` first, so they still run in order.
+    """
+
+    def __init__(self, send, inline=True):
+        self._send = send
+        self.inline = inline
+        self._calls = []
+
+    def send_message(self, chat_id, text, reply_markup=None):
+        if reply_markup is not None and hasattr(reply_markup, "to_dict"):
+            reply_markup = reply_markup.to_dict()
+
+        previous = self._calls[-1] if self._calls else None
+        if (
+            previous
+            and previous["method"] == "sendMessage"
+            and previous["chat_id"] == chat_id
+            and not (reply_markup and previous.get("reply_markup"))
+        ):
+            previous["text"] = f"{previous['text']}\n\n{text}"
+            if reply_markup:
+                previous["reply_markup"] = reply_markup
+            return
+
+        call = {"method": "sendMessage", "chat_id": chat_id, "text": text}
+        if reply_markup:
+            call["reply_markup"] = reply_markup
+        self._calls.append(call)
+
+    def answer_callback_query(self, callback_query_id, text=None, show_alert=False):
+        """Stop the button's loading spinner, optionally showing a short notification."""
+        call = {"method": "answerCallbackQuery", "callback_query_id": callback_query_id}
+        if text:
+            call["text"] = text
+        if show_alert:
+            call["show_alert"] = True
+        self._calls.append(call)
+
+    def response(self, status="ok"):
+        """Send what can't be inlined and return the JSON body for the webhook response."""
+        calls, self._calls = self._calls, []
+        inline_call = calls.pop() if calls and self.inline else None
+        for call in calls:
+            payload = dict(call)
+            self._send(payload.pop("method"), payload)
+        return inline_call or {"status": status}
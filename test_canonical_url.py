@@ -0,0 +1,73 @@
+import pytest
+
+from canonical_url import canonicalize_url, extract_asin
+
+
+@pytest.mark.parametrize("first, second", [
+    ("https://stackoverflow.com/questions?tag=python", "https://stackoverflow.com/questions?tag=java"),
+    ("https://github.com/pallets/flask/blob/x.py?ref=main", "https://github.com/pallets/flask/blob/x.py?ref=dev"),
+    ("https://app.com/#/inbox", "https://app.com/#/settings"),
+    ("https://app.com/#!/inbox", "https://app.com/#!/settings"),
+    ("https://example.com/watch?si=abc", "https://example.com/watch?si=def"),
+])
+def test_distinct_pages_keep_distinct_keys(first, second):
+    assert canonicalize_url(first) != canonicalize_url(second)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("https://www.example.com/post/?utm_source=x&b=2&a=1", "https://example.com/post?a=1&b=2"),
+    ("https://example.com/post#comments", "https://example.com/post"),
+    ("https://example.com/post?fbclid=abc", "https://m.example.com/post"),
+    ("https://www.youtube.com/watch?v=abc&si=xyz", "https://youtube.com/watch?v=abc"),
+    ("https://www.amazon.de/s?k=lamp&tag=aff-21&ref=nav", "https://amazon.de/s?k=lamp"),
+])
+def test_variants_of_a_page_share_a_key(first, second):
+    assert canonicalize_url(first) == canonicalize_url(second)
+
+
+@pytest.mark.parametrize("link", [
+    "https://www.amazon.com/dp/B08N5WRWNW",
+    "https://amazon.com/Echo-Dot/dp/B08N5WRWNW/ref=sr_1_1?tag=aff-20",
+    "https://www.amazon.com/gp/product/b08n5wrwnw?th=1",
+    "https://www.amazon.com/gp/aw/d/B08N5WRWNW",
+    "https://www.amazon.com/exec/obidos/ASIN/B08N5WRWNW",
+    "https://www.amazon.com/o/asin/B08N5WRWNW",
+    "https://smile.amazon.com/dp/B08N5WRWNW#reviews",
+])
+def test_amazon_product_links_use_the_asin(link):
+    assert canonicalize_url(link) == "https://www.amazon.com/dp/B08N5WRWNW"
+
+
+def test_amazon_keeps_its_marketplace():
+    assert canonicalize_url("https://www.amazon.co.uk/dp/B08N5WRWNW") == "https://www.amazon.co.uk/dp/B08N5WRWNW"
+
+
+def test_extract_asin_without_product_path():
+    assert extract_asin("/s") is None
+
+
+@pytest.mark.parametrize("first, second", [
+    ("http://example.com:8080/x", "https://example.com/x"),
+    ("https://example.com:8443/x", "https://example.com/x"),
+])
+def test_non_default_ports_are_kept(first, second):
+    assert canonicalize_url(first) != canonicalize_url(second)
+
+
+@pytest.mark.parametrize("link, expected", [
+    ("http://example.com:80/x", "https://example.com/x"),
+    ("https://example.com:443/x", "https://example.com/x"),
+    ("http://example.com:8080/x/", "https://example.com:8080/x"),
+    ("http://[::1]:8080/x", "https://[::1]:8080/x"),
+])
+def test_default_ports_are_dropped(link, expected):
+    assert canonicalize_url(link) == expected
+
+
+@pytest.mark.parametrize("link", [
+    "https://amazon.evil.com/dp/B08N5WRWNW",
+    "https://www.amazon.example/dp/B08N5WRWNW",
+    "https://notamazon.com/dp/B08N5WRWNW",
+])
+def test_lookalike_hosts_are_not_amazon(link):
+    assert not canonicalize_url(link).startswith("https://www.amazon.")
@@ -0,0 +1,17 @@
+import pytest
+
+from price_refresh import parse_price
+
+
+@pytest.mark.parametrize("price, expected", [
+    ("$1,299.99", 1299.99),
+    ("1.299,99 €", 1299.99),
+    ("12.5", 12.5),
+    ("EUR 3,5", 3.5),
+    ("1,299", 1299.0),
+    ("$9", 9.0),
+    ("N/A", None),
+    (None, None),
+])
+def test_parse_price(price, expected):
+    assert parse_price(price) == expected